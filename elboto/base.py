@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import importlib.util
 import sys
 from typing import Dict, Iterable, Tuple, Union
 
@@ -34,12 +36,19 @@ class Elboto(Bot):
             intents=intents,
         )
 
+        # Python 3.12+: run command coroutines inline until they first suspend
+        eager_task_factory = getattr(asyncio, "eager_task_factory", None)
+        if eager_task_factory is not None:
+            self.loop.set_task_factory(eager_task_factory)
+
+        missing_extensions = tuple(
+            x for x in _STARTUP_EXTENSIONS if importlib.util.find_spec(x) is None
+        )
+        if missing_extensions:
+            print(f"Missing extensions: {missing_extensions}", file=sys.stderr)
         for extension in _STARTUP_EXTENSIONS:
-            try:
+            if extension not in missing_extensions:
                 self.load_extension(extension)
-            except Exception as exc:
-                print(f"Failed to load extension {extension}.", file=sys.stderr)
-                print(exc)
 
     async def on_command_error(self, ctx: Context, exception: Exception) -> None:
         await ctx.reply(f"{exception} ({type(exception).__name__})")
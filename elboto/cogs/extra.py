@@ -5,6 +5,9 @@ from discord.ext.typed_commands import Cog, Context
 
 from elboto.base import Elboto
 
+_HELLO_EMOJI = "🖖"
+_CODE_URL = "https://github.com/Eloston/elboto-discord"
+
 
 class Extra(Cog):
     def __init__(self, bot: Elboto):
@@ -12,11 +15,11 @@ class Extra(Cog):
 
     @commands.command(aliases=["hi", "ping", "hey", "whatsup", "yo", "poke"])
     async def hello(self, ctx: Context) -> None:
-        await ctx.message.add_reaction("🖖")
+        await ctx.message.add_reaction(_HELLO_EMOJI)
 
     @commands.command()
     async def code(self, ctx: Context) -> None:
-        await ctx.message.reply('https://github.com/Eloston/elboto-discord')
+        await ctx.message.reply(_CODE_URL)
 
 
 def setup(bot: Elboto) -> None:
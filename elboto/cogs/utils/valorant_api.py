@@ -1,14 +1,100 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import collections
+import contextlib
 import datetime
 import enum
-import json
+import hashlib
+import hmac
+import os
 import sys
+import time
 import urllib.parse
-from typing import Any, Awaitable, Dict, Optional, Tuple, cast
+from typing import (Any, AsyncIterator, Awaitable, Callable, Deque, Dict,
+                    Hashable, Optional, Tuple, TypeVar, Union, cast)
 
-from aiohttp import ClientSession
+from aiohttp import BaseConnector, ClientResponse, ClientSession, TCPConnector
+from yarl import URL
+
+from elboto.utils import PersistDictStorage, load_json
+
+
+_CLIENT_PLATFORM = "ew0KCSJwbGF0Zm9ybVR5cGUiOiAiUEMiLA0KCSJwbGF0Zm9ybU9TIjogIldpbmRvd3MiLA0KCSJwbGF0Zm9ybU9TVmVyc2lvbiI6ICIxMC4wLjE5MDQyLjEuMjU2LjY0Yml0IiwNCgkicGxhdGZvcm1DaGlwc2V0IjogIlVua25vd24iDQp9"
+
+# Seconds before their actual expiry that tokens are treated as expired, so
+# they are not about to expire while in use
+_TOKEN_EXPIRY_SKEW = 30
+
+# Riot tokens of the configured account keyed by region and username, kept
+# across cog reloads and restarts
+_TOKEN_CACHE = PersistDictStorage("valorant_tokens")
+
+# (start index, number of records) of each match history window searched for
+# the current competitive stats, from most to least recent
+_COMPET_STATS_WINDOWS = ((0, 5), (5, 10), (15, 20), (35, 20))
+
+# Seconds to reuse the competitive stats of a player
+_COMPET_STATS_CACHE_TTL = 60
+# Once the cache holds more players than this, entries older than
+# _COMPET_STATS_CACHE_MAX_AGE seconds are evicted
+_COMPET_STATS_CACHE_SIZE = 1024
+_COMPET_STATS_CACHE_MAX_AGE = 600
+
+# Maximum requests per second to Riot, per region
+_RIOT_RATE_LIMIT = 5
+# Retries of a request rejected with HTTP 429, with exponential backoff
+_RIOT_MAX_RETRIES = 3
+
+
+def make_connector() -> TCPConnector:
+    # Every request goes to a handful of hosts, so keep their connections and
+    # DNS results around between commands
+    return TCPConnector(
+        limit=100, limit_per_host=20, ttl_dns_cache=300, keepalive_timeout=75
+    )
+
+
+class _RateLimiter:
+    # Sliding window limit of max_rate entries per period seconds
+
+    def __init__(self, max_rate: int, period: float):
+        self._max_rate = max_rate
+        self._period = period
+        self._entry_times: Deque[float] = collections.deque()
+
+    async def __aenter__(self) -> None:
+        while len(self._entry_times) >= self._max_rate:
+            delay = self._entry_times[0] + self._period - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self._entry_times.popleft()
+        self._entry_times.append(time.monotonic())
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+
+# Shared by all clients of a region
+_RIOT_LIMITERS: Dict["RiotAPIRegion", _RateLimiter] = dict()
+
+_T = TypeVar("_T")
+
+
+async def _coalesce(
+    inflight: Dict[Hashable, "asyncio.Future[Any]"],
+    key: Hashable,
+    factory: Callable[[], Awaitable[_T]],
+) -> _T:
+    # Callers with the same key share the one request already in flight
+    future = inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(factory())
+        inflight[key] = future
+        future.add_done_callback(lambda _: inflight.pop(key, None))
+    # Shielded so a cancelled caller does not cancel the request for the others
+    return cast(_T, await asyncio.shield(future))
 
 
 class RiotAuthError(Exception):
@@ -35,18 +121,41 @@ class RiotAPIClient:
         region: RiotAPIRegion,
         username: str,
         password: str,
+        connector: Optional[BaseConnector] = None,
+        cache_tokens: bool = True,
     ):
         self.region = region
+        self._connector = connector
+        if region not in _RIOT_LIMITERS:
+            _RIOT_LIMITERS[region] = _RateLimiter(_RIOT_RATE_LIMIT, 1)
+        self._limiter = _RIOT_LIMITERS[region]
+        self._pd_endpoint = f"https://pd.{region.value}.a.pvp.net"
+        self._shared_endpoint = f"https://shared.{region.value}.a.pvp.net"
+        self._mmr_players_url = URL(self._pd_endpoint) / "mmr" / "v1" / "players"
         self._username = username
         self._password = password
+        # Only the bot's own account should persist its tokens
+        self._token_cache_key: Optional[str] = None
+        if cache_tokens:
+            self._token_cache_key = f"{region.value}\0{username}"
 
         # Token-related state
         self._access_token: Optional[str] = None
         self._id_token: Optional[str] = None
         self._entitlements_token: Optional[str] = None
-        self._expires: Optional[datetime.datetime] = None
+        self._expires: Optional[float] = None  # time.monotonic() deadline
+        self._authorization_headers: Optional[Dict[str, str]] = None
+        self._full_headers: Optional[Dict[str, str]] = None
         self._refresh_lock = asyncio.Lock()
 
+        # Competitive stats by puuid, with the time.monotonic() they were fetched
+        self._compet_stats_cache: Dict[
+            str, Tuple[float, Optional[Tuple[int, int, datetime.datetime]]]
+        ] = dict()
+
+        # Pending MMR requests by (puuid, start_index, end_index)
+        self._inflight_mmr: Dict[Hashable, "asyncio.Future[Any]"] = dict()
+
         # Userinfo-related state
         self._userinfo: Optional[Dict[str, Any]] = None
         self._userinfo_lock = asyncio.Lock()
@@ -54,11 +163,32 @@ class RiotAPIClient:
         self._make_session()
 
     def _make_session(self) -> None:
-        self.session = ClientSession()
+        # Sessions are kept per client for cookie isolation, but may share the
+        # connection pool of a connector owned by the caller
+        self.session = ClientSession(
+            connector=make_connector() if self._connector is None else self._connector,
+            connector_owner=self._connector is None,
+        )
 
     def unload(self) -> Awaitable:
         return self.session.close()
 
+    @contextlib.asynccontextmanager
+    async def _request(
+        self, method: str, url: Union[str, URL], **kwargs: Any
+    ) -> AsyncIterator[ClientResponse]:
+        for attempt in range(_RIOT_MAX_RETRIES + 1):
+            async with self._limiter:
+                response = await self.session.request(method, url, **kwargs)
+            if response.status != 429 or attempt == _RIOT_MAX_RETRIES:
+                break
+            response.release()
+            await asyncio.sleep(2 ** attempt)
+        try:
+            yield response
+        finally:
+            response.release()
+
     def _are_tokens_valid(self) -> bool:
         if (
             self._access_token is None
@@ -67,28 +197,18 @@ class RiotAPIClient:
             or self._expires is None
         ):
             return False
-        if datetime.datetime.utcnow() > self._expires:
+        if time.monotonic() > self._expires:
             # Tokens have expired
             return False
         return True
 
     def _get_authorization_headers(self) -> Dict[str, str]:
-        assert self._access_token is not None, "access_token exists"
-
-        headers = dict()
-        headers["Authorization"] = f"Bearer {self._access_token}"
-        return headers
+        assert self._authorization_headers is not None, "authorization_headers exists"
+        return self._authorization_headers
 
     def _get_full_headers(self) -> Dict[str, str]:
-        assert self._entitlements_token is not None, "entitlements_token exists"
-
-        headers = dict()
-        headers.update(self._get_authorization_headers())
-        headers["X-Riot-Entitlements-JWT"] = self._entitlements_token
-        headers[
-            "X-Riot-ClientPlatform"
-        ] = "ew0KCSJwbGF0Zm9ybVR5cGUiOiAiUEMiLA0KCSJwbGF0Zm9ybU9TIjogIldpbmRvd3MiLA0KCSJwbGF0Zm9ybU9TVmVyc2lvbiI6ICIxMC4wLjE5MDQyLjEuMjU2LjY0Yml0IiwNCgkicGxhdGZvcm1DaGlwc2V0IjogIlVua25vd24iDQp9"
-        return headers
+        assert self._full_headers is not None, "full_headers exists"
+        return self._full_headers
 
     async def _do_authorization(self) -> None:
         # Based on https://github.com/RumbleMike/ValorantStreamOverlay/blob/4737044373e9e467468481f8965d27217260009b/Authentication.cs#L16-L28
@@ -99,9 +219,12 @@ class RiotAPIClient:
             "response_type": "token id_token",
             "scope": "account openid",
         }
-        await self.session.post(
-            "https://auth.riotgames.com/api/v1/authorization", json=payload
-        )
+        # The response body is unused, but this request must finish before
+        # _update_access_token() since it sets the cookies used by the PUT.
+        async with self._request(
+            "POST", "https://auth.riotgames.com/api/v1/authorization", json=payload
+        ):
+            pass
 
     async def _update_access_token(self) -> None:
         payload = {
@@ -109,10 +232,10 @@ class RiotAPIClient:
             "username": self._username,
             "password": self._password,
         }
-        async with self.session.put(
-            "https://auth.riotgames.com/api/v1/authorization", json=payload
+        async with self._request(
+            "PUT", "https://auth.riotgames.com/api/v1/authorization", json=payload
         ) as response:
-            data = await response.json()
+            data = await response.json(loads=load_json)
         if "error" in data:
             print("Error in _update_access_token:", data, file=sys.stderr)
             raise RiotAuthError(
@@ -120,49 +243,115 @@ class RiotAPIClient:
             )
         assert data["type"] == "response", "type is response"
         assert data["response"]["mode"] == "fragment", "response/mode is fragment"
-        response_qs = urllib.parse.urlparse(
-            data["response"]["parameters"]["uri"]
-        ).fragment
-
-        response_fields = urllib.parse.parse_qs(response_qs, strict_parsing=True)
-        assert len(response_fields["access_token"]) == 1, "only one access_token"
-        assert len(response_fields["id_token"]) == 1, "only one id_token"
-        assert len(response_fields["expires_in"]) == 1, "only one expires_in"
-        self._access_token = response_fields["access_token"][0]
-        self._id_token = response_fields["id_token"][0]
-        expires_in = datetime.timedelta(seconds=int(response_fields["expires_in"][0]))
-        self._expires = datetime.datetime.utcnow() + expires_in
+        _, _, response_qs = data["response"]["parameters"]["uri"].partition("#")
+
+        response_fields: Dict[str, str] = dict()
+        for key, value in urllib.parse.parse_qsl(response_qs, strict_parsing=True):
+            if key in ("access_token", "id_token", "expires_in"):
+                assert key not in response_fields, f"only one {key}"
+                response_fields[key] = value
+        self._access_token = response_fields["access_token"]
+        self._id_token = response_fields["id_token"]
+        self._update_authorization_headers()
+        self._expires = (
+            time.monotonic()
+            + int(response_fields["expires_in"])
+            - _TOKEN_EXPIRY_SKEW
+        )
 
     async def _update_entitlement_token(self) -> None:
         assert self._access_token is not None, "access_token exists"
 
-        async with self.session.post(
+        async with self._request(
+            "POST",
             "https://entitlements.auth.riotgames.com/api/token/v1",
             headers=self._get_authorization_headers(),
             json=dict(),
         ) as response:
-            data = await response.json()
+            data = await response.json(loads=load_json)
+        self._entitlements_token = cast(str, data["entitlements_token"])
+        self._update_full_headers()
+
+    def _update_authorization_headers(self) -> None:
+        assert self._access_token is not None, "access_token exists"
+
+        # Headers only change when the tokens do, so build them once per refresh
+        self._authorization_headers = {"Authorization": f"Bearer {self._access_token}"}
+
+    def _update_full_headers(self) -> None:
+        assert self._entitlements_token is not None, "entitlements_token exists"
+
+        headers = dict(self._get_authorization_headers())
+        headers["X-Riot-Entitlements-JWT"] = self._entitlements_token
+        headers["X-Riot-ClientPlatform"] = _CLIENT_PLATFORM
+        self._full_headers = headers
+
+    def _hash_password(self, salt: bytes) -> str:
+        return hmac.new(salt, self._password.encode(), hashlib.sha256).hexdigest()
+
+    async def _load_cached_tokens(self) -> bool:
+        if self._token_cache_key is None:
+            return False
+        await _TOKEN_CACHE.load_async()
+        # Expiry skew is already included in the stored expiries
+        now = time.time()
+        for key, value in tuple(_TOKEN_CACHE.items_json()):
+            if value["expires"] <= now:
+                await _TOKEN_CACHE.delete_async(key)
+        try:
+            data = _TOKEN_CACHE.read_json(self._token_cache_key)
+        except KeyError:
+            return False
+        # Tokens cached under a different password must not be reused
+        if "salt" not in data or not hmac.compare_digest(
+            data["password_hash"], self._hash_password(bytes.fromhex(data["salt"]))
+        ):
+            return False
+        expires_in = data["expires"] - now
+        self._access_token = data["access_token"]
+        self._id_token = data["id_token"]
         self._entitlements_token = data["entitlements_token"]
+        self._expires = time.monotonic() + expires_in
+        self._update_authorization_headers()
+        self._update_full_headers()
+        return True
+
+    async def _store_cached_tokens(self) -> None:
+        assert self._expires is not None, "expires exists"
+        if self._token_cache_key is None:
+            return
+
+        salt = os.urandom(16)
+        # The monotonic clock is per-process, so persist a wall-clock expiry
+        await _TOKEN_CACHE.store_json_async(
+            self._token_cache_key,
+            dict(
+                salt=salt.hex(),
+                password_hash=self._hash_password(salt),
+                access_token=self._access_token,
+                id_token=self._id_token,
+                entitlements_token=self._entitlements_token,
+                expires=time.time() + self._expires - time.monotonic(),
+            ),
+        )
 
     async def _update_tokens(self) -> None:
-        await self.session.close()
-        self._make_session()
+        # Start the auth flow with fresh cookies, but keep the connection pool
+        self.session.cookie_jar.clear()
         await self._do_authorization()
         await self._update_access_token()
         await self._update_entitlement_token()
 
-    @property
-    def _pd_endpoint(self) -> str:
-        return f"https://pd.{self.region.value}.a.pvp.net"
-
-    @property
-    def _shared_endpoint(self) -> str:
-        return f"https://shared.{self.region.value}.a.pvp.net"
-
     async def refresh_tokens(self, force: bool = False) -> None:
+        if not force and self._are_tokens_valid():
+            # Fast path; skip waiting on the lock while another refresh runs
+            return
         async with self._refresh_lock:
+            # Tokens may have been refreshed while waiting for the lock
             if force or not self._are_tokens_valid():
-                await self._update_tokens()
+                if force or not await self._load_cached_tokens():
+                    await self._update_tokens()
+                    await self._store_cached_tokens()
                 assert self._are_tokens_valid(), "tokens are valid after updating"
 
     async def get_userinfo(self) -> Dict[str, Any]:
@@ -170,65 +359,133 @@ class RiotAPIClient:
             if self._userinfo is None:
                 # Refer: https://github.com/RumbleMike/ValorantStreamOverlay/blob/4737044373e9e467468481f8965d27217260009b/LogicHandler.cs#L109-L121
                 await self.refresh_tokens()
-                async with self.session.post(
+                async with self._request(
+                    "POST",
                     "https://auth.riotgames.com/userinfo",
                     headers=self._get_authorization_headers(),
                 ) as response:
-                    self._userinfo = cast(Dict[str, Any], await response.json())
+                    self._userinfo = cast(Dict[str, Any], await response.json(loads=load_json))
             return self._userinfo
 
     async def get_mmr(
         self, puuid: str, start_index: int = 0, end_index: int = 20
     ) -> Dict[str, Any]:
+        return await _coalesce(
+            self._inflight_mmr,
+            (puuid, start_index, end_index),
+            lambda: self._get_mmr(puuid, start_index, end_index),
+        )
+
+    async def _get_mmr(
+        self, puuid: str, start_index: int, end_index: int
+    ) -> Dict[str, Any]:
+        raw = await self.get_mmr_raw(puuid, start_index, end_index)
+        return cast(Dict[str, Any], load_json(raw))
+
+    async def get_mmr_raw(
+        self, puuid: str, start_index: int = 0, end_index: int = 20
+    ) -> bytes:
         # Refer:
         # - https://github.com/RumbleMike/ValorantStreamOverlay/blob/4737044373e9e467468481f8965d27217260009b/RankDetection.cs#L37-L72
         # - https://github.com/RumbleMike/ValorantClientAPI/blob/master/Docs/PlayerMMR.md
         await self.refresh_tokens()
-        async with self.session.get(
-            f"{self._pd_endpoint}/mmr/v1/players/{puuid}/competitiveupdates?startIndex={start_index}&endIndex={end_index}",
+        async with self._request(
+            "GET",
+            self._mmr_players_url / puuid / "competitiveupdates",
+            params={"startIndex": start_index, "endIndex": end_index},
             headers=self._get_full_headers(),
         ) as response:
-            return cast(Dict[str, Any], json.loads(await response.text()))
+            return await response.read()
+
+    @staticmethod
+    def _find_compet_stats(
+        puuid: str, start_index: int, num_records: int, mmr_data: Dict[str, Any]
+    ) -> Optional[Tuple[int, int, datetime.datetime]]:
+        if "errorCode" in mmr_data:
+            raise RiotAPIError(
+                f"Error retrieving MMR data in range {start_index}->{start_index+num_records}: {mmr_data}"
+            )
+        if "Matches" not in mmr_data:
+            print(f"No Matches key in MMR data (puuid: {puuid}): {mmr_data}")
+            raise RiotAPIError(
+                f"Did not find Matches key in MMR data range {start_index}->{start_index+num_records}"
+            )
+        if not mmr_data["Matches"]:
+            # No match data found
+            raise RiotAPIError(
+                f"Did not find any matches in MMR data range {start_index}->{start_index+num_records}"
+            )
+        assert mmr_data["Subject"] == puuid, "MMR data should belong to the player"
+        for match in mmr_data["Matches"]:
+            tier_after = match["TierAfterUpdate"]
+            ranked_rating_after = match["RankedRatingAfterUpdate"]
+            if not (
+                tier_after
+                | match["TierBeforeUpdate"]
+                | ranked_rating_after
+                | match["RankedRatingBeforeUpdate"]
+            ):
+                # Unrated match(?), skipping
+                continue
+            return (
+                int(tier_after),
+                int(ranked_rating_after),
+                datetime.datetime.utcfromtimestamp(match["MatchStartTime"] / 1000),
+            )
+        return None
 
     async def get_current_compet_stats(
         self, puuid: str
     ) -> Optional[Tuple[int, int, datetime.datetime]]:
-        start_index = 0
-        for num_records in [5, 10, 20, 20]:
-            mmr_data = await self.get_mmr(
-                puuid, start_index, start_index + num_records - 1
-            )
-            if "errorCode" in mmr_data:
-                raise RiotAPIError(
-                    f"Error retrieving MMR data in range {start_index}->{start_index+num_records}: {mmr_data}"
-                )
-            if "Matches" not in mmr_data:
-                print(f"No Matches key in MMR data (puuid: {puuid}): {mmr_data}")
-                raise RiotAPIError(
-                    f"Did not find Matches key in MMR data range {start_index}->{start_index+num_records}"
-                )
-            if not mmr_data["Matches"]:
-                # No match data found
-                raise RiotAPIError(
-                    f"Did not find any matches in MMR data range {start_index}->{start_index+num_records}"
-                )
-            start_index += num_records
-            assert mmr_data["Subject"] == puuid, "MMR data should belong to the player"
-            for match in mmr_data["Matches"]:
-                if (
-                    match["TierAfterUpdate"] == 0
-                    and match["TierBeforeUpdate"] == 0
-                    and match["RankedRatingAfterUpdate"] == 0
-                    and match["RankedRatingBeforeUpdate"] == 0
-                ):
-                    # Unrated match(?), skipping
-                    continue
-                return (
-                    int(match["TierAfterUpdate"]),
-                    int(match["RankedRatingAfterUpdate"]),
-                    datetime.datetime.utcfromtimestamp(match["MatchStartTime"] / 1000),
+        entry = self._compet_stats_cache.get(puuid)
+        if entry is not None and time.monotonic() - entry[0] < _COMPET_STATS_CACHE_TTL:
+            return entry[1]
+        stats = await self._get_current_compet_stats(puuid)
+
+        now = time.monotonic()
+        if len(self._compet_stats_cache) >= _COMPET_STATS_CACHE_SIZE:
+            self._compet_stats_cache = {
+                key: value
+                for key, value in self._compet_stats_cache.items()
+                if now - value[0] < _COMPET_STATS_CACHE_MAX_AGE
+            }
+        self._compet_stats_cache[puuid] = (now, stats)
+        return stats
+
+    async def _get_current_compet_stats(
+        self, puuid: str
+    ) -> Optional[Tuple[int, int, datetime.datetime]]:
+        # Refresh up front so the concurrent requests below don't each wait on it
+        await self.refresh_tokens()
+
+        # The most recent window usually has a rated match, so try it alone first
+        start_index, num_records = _COMPET_STATS_WINDOWS[0]
+        mmr_data = await self.get_mmr(puuid, start_index, start_index + num_records - 1)
+        stats = self._find_compet_stats(puuid, start_index, num_records, mmr_data)
+        if stats is not None:
+            return stats
+
+        # Otherwise fetch the older windows concurrently, but check them in order
+        # and stop waiting on the rest once one has a rated match
+        windows = _COMPET_STATS_WINDOWS[1:]
+        tasks = [
+            asyncio.ensure_future(self.get_mmr(puuid, x, x + n - 1)) for x, n in windows
+        ]
+        try:
+            for (start_index, num_records), task in zip(windows, tasks):
+                stats = self._find_compet_stats(
+                    puuid, start_index, num_records, await task
                 )
-        return None
+                if stats is not None:
+                    return stats
+            return None
+        finally:
+            # Requests are shielded in get_mmr(), so this only stops waiting
+            for task in tasks:
+                if not task.cancel() and not task.cancelled():
+                    # Already done, so mark any failure of an unchecked window
+                    # as retrieved
+                    task.exception()
 
     async def get_nametag(self) -> Tuple[str, str]:
         userinfo = await self.get_userinfo()
@@ -256,21 +513,47 @@ class Henrik3APIClient:
 
     _endpoint = "https://api.henrikdev.xyz"
 
+    def __init__(self, connector: Optional[BaseConnector] = None) -> None:
+        self._connector = connector
+        self._session: Optional[ClientSession] = None
+        # Pending account requests by (name, tag)
+        self._inflight_accounts: Dict[Hashable, "asyncio.Future[Any]"] = dict()
+
+    async def _get_session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector, connector_owner=self._connector is None
+            )
+        return self._session
+
+    def unload(self) -> Awaitable:
+        if self._session is None:
+            return asyncio.sleep(0)
+        return self._session.close()
+
     def get_account_url(self, name: str, tag: str) -> str:
         return f"{self._endpoint}/valorant/v1/account/{name}/{tag}"
 
+    async def get_account(self, name: str, tag: str) -> Dict[str, Any]:
+        return await _coalesce(
+            self._inflight_accounts, (name, tag), lambda: self._get_account(name, tag)
+        )
+
+    async def _get_account(self, name: str, tag: str) -> Dict[str, Any]:
+        session = await self._get_session()
+        async with session.get(self.get_account_url(name, tag)) as response:
+            data = await response.json(loads=load_json)
+        assert "status" in data, f"Could not find 'status' in data: {data}"
+        if data["status"] != "200":
+            raise Henrik3APIError(int(data["status"]), str(data["message"]))
+        assert "data" in data, f"Could not find 'data' in data: {data}"
+        return cast(Dict[str, Any], data["data"])
+
     async def get_puuid(self, name: str, tag: str) -> Tuple[RiotAPIRegion, str]:
-        async with ClientSession() as session:
-            async with session.get(self.get_account_url(name, tag)) as response:
-                data = await response.json()
-            assert "status" in data, f"Could not find 'status' in data: {data}"
-            if data["status"] != "200":
-                raise Henrik3APIError(int(data["status"]), str(data["message"]))
-            assert "data" in data, f"Could not find 'data' in data: {data}"
-            data = data["data"]
-            assert "region" in data, f"Could not find 'region' in data: {data}"
-            region = RiotAPIRegion(data["region"])
-            assert "puuid" in data, f"Could not find 'puuid' in payload: {data}"
-            puuid = data["puuid"]
-            assert isinstance(puuid, str), f"puuid is not a string: {puuid}"
-            return region, puuid
+        data = await self.get_account(name, tag)
+        assert "region" in data, f"Could not find 'region' in data: {data}"
+        region = RiotAPIRegion(data["region"])
+        assert "puuid" in data, f"Could not find 'puuid' in payload: {data}"
+        puuid = data["puuid"]
+        assert isinstance(puuid, str), f"puuid is not a string: {puuid}"
+        return region, puuid
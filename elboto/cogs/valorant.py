@@ -1,30 +1,24 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
-import functools
 import io
-import json
 import sys
 import traceback
-from typing import Dict, Optional, Tuple, cast
+from typing import Dict, Optional, Tuple
 
 import discord
 import discord.ext.typed_commands as commands
 from discord.ext.typed_commands import Cog, CommandError, Context
 
 from elboto.base import Elboto
-from elboto.utils import DATA_DIR, PersistDictStorage
+from elboto.utils import (PersistDictStorage, dump_json_pretty, get_rank_names,
+                          load_json)
 
 from .utils.valorant_api import (Henrik3APIClient, Henrik3APIError,
-                                 RiotAPIClient, RiotAPIRegion)
+                                 RiotAPIClient, RiotAPIRegion, make_connector)
 
 
-def _read_ranks() -> Dict[str, str]:
-    with (DATA_DIR / "valorant" / "ranks.json").open() as fp:
-        return cast(Dict[str, str], json.load(fp)["Ranks"])
-
-
-_RANK_NAMES = _read_ranks()
+_RANK_NAMES = get_rank_names()
 
 
 def _print_context(ctx: Context) -> None:
@@ -37,10 +31,19 @@ Message ({ctx.message.author.name}#{ctx.message.author.discriminator}): {repr(ct
     )
 
 
+def _print_task_exception(task: "asyncio.Task[None]") -> None:
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        print(f"Exception in background task {task!r}:", file=sys.stderr)
+        traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
 def _split_nametag(nametag: str) -> Tuple[str, str]:
-    if nametag.count("#") != 1:
+    name, sep, tag = nametag.partition("#")
+    if not sep or "#" in tag:
         raise ValueError("Nametag must have exactly one #")
-    name, tag = nametag.split("#")
     return name, tag
 
 
@@ -57,8 +60,18 @@ class Valorant(Cog):
         self.bot = bot
 
         self._persist_dict = PersistDictStorage("valorant")
+        self._persist_dict_load = self.bot.loop.create_task(
+            self._persist_dict.load_async()
+        )
+        self._persist_dict_load.add_done_callback(_print_task_exception)
+        # Shared by all API clients so they reuse one connection pool
+        self._connector = make_connector()
         self._riot_clients: Dict[RiotAPIRegion, RiotAPIClient] = dict()
-        self._henrik3_client = Henrik3APIClient()
+        self._henrik3_client = Henrik3APIClient(self._connector)
+
+        access_roles = self.bot.config.valorant_access_roles
+        self._access_role_ids = {x for x in access_roles if isinstance(x, int)}
+        self._access_role_names = {x for x in access_roles if isinstance(x, str)}
 
     def _has_guild_roles(self, ctx: Context) -> bool:
         if not isinstance(ctx.channel, discord.abc.GuildChannel) or not isinstance(
@@ -66,26 +79,30 @@ class Valorant(Cog):
         ):
             return False
 
-        getter = functools.partial(discord.utils.get, ctx.author.roles)
-        if any(
-            getter(id=item) is not None
-            if isinstance(item, int)
-            else getter(name=item) is not None
-            for item in self.bot.config.valorant_access_roles
-        ):
-            return True
-        return False
+        return any(
+            role.id in self._access_role_ids or role.name in self._access_role_names
+            for role in ctx.author.roles
+        )
 
     async def cog_check(self, ctx: Context) -> bool:
+        # Check the cheap, local predicates before is_owner(), which may need
+        # to fetch the application info
         return (
-            await self.bot.is_owner(ctx.author)
-            or _is_guild_owner(ctx)
+            _is_guild_owner(ctx)
             or self._has_guild_roles(ctx)
+            or await self.bot.is_owner(ctx.author)
+        )
+
+    async def _unload_clients(self) -> None:
+        await asyncio.gather(
+            *(client.unload() for client in self._riot_clients.values()),
+            self._henrik3_client.unload(),
+            return_exceptions=True,
         )
+        await self._connector.close()
 
     def cog_unload(self) -> None:
-        for client in self._riot_clients.values():
-            asyncio.run_coroutine_threadsafe(client.unload(), self.bot.loop)
+        asyncio.run_coroutine_threadsafe(self._unload_clients(), self.bot.loop)
 
     async def cog_command_error(self, ctx: Context, error: CommandError) -> None:
         _print_context(ctx)
@@ -98,7 +115,9 @@ class Valorant(Cog):
                 raise CommandError(
                     f"Username or password is invalid for region {region}"
                 )
-            self._riot_clients[region] = RiotAPIClient(region, username, password)
+            self._riot_clients[region] = RiotAPIClient(
+                region, username, password, self._connector
+            )
         return self._riot_clients[region]
 
     @commands.group(aliases=["valorant", "val"], invoke_without_command=True)
@@ -120,7 +139,7 @@ class Valorant(Cog):
     async def userinfo(self, ctx: Context, region: RiotAPIRegion) -> None:
         async with ctx.typing():
             data = await self._get_backend_client(region).get_userinfo()
-            await ctx.reply(f"""```json\n{json.dumps(data, indent=2)}\n```""")
+            await ctx.reply(f"""```json\n{dump_json_pretty(data).decode("UTF-8")}\n```""")
 
     @valo_admin.command()
     async def list(self, ctx: Context, *, region: Optional[RiotAPIRegion] = None) -> None:
@@ -131,7 +150,7 @@ class Valorant(Cog):
             filtered_nametags = self._persist_dict.keys()
         else:
             msg = f"Registrations in {region.upper()}:\n"
-            filtered_nametags = tuple(filter(lambda x: self._persist_dict.read_json(x)["region"] == region, self._persist_dict.keys()))
+            filtered_nametags = tuple(nametag for nametag, data in self._persist_dict.items_json() if data["region"] == region)
         if filtered_nametags:
             await ctx.reply(msg + "\n".join(f"`{nametag}`" for nametag in sorted(filtered_nametags)))
         else:
@@ -147,10 +166,10 @@ class Valorant(Cog):
         end_index: int,
     ) -> None:
         async with ctx.typing():
-            data = await self._get_backend_client(region).get_mmr(
+            raw = await self._get_backend_client(region).get_mmr_raw(
                 puuid, start_index, end_index
             )
-            data_io = io.BytesIO(json.dumps(data, indent=2).encode("UTF-8"))
+            data_io = io.BytesIO(dump_json_pretty(load_json(raw)))
             await ctx.reply(
                 "See attachment", file=discord.File(data_io, f"mmr_{puuid}.json")
             )
@@ -166,33 +185,39 @@ class Valorant(Cog):
             else:
                 tier, ranked_rating, match_start_time = data
                 await ctx.reply(
-                    f"""Rank: {_RANK_NAMES[str(tier)]}
+                    f"""Rank: {_RANK_NAMES[tier]}
 Ranked Rating: {ranked_rating}
 Updated (UTC): {match_start_time.strftime('%c')}"""
                 )
 
     @valo.command()
     async def rank(self, ctx: Context, nametag: str) -> None:
-        if nametag not in self._persist_dict.keys():
-            await self.register(ctx, nametag)
         try:
             data = self._persist_dict.read_json(nametag)
         except KeyError:
-            # Registration still failed, and registration printed error message already.
-            return
+            await self.register(ctx, nametag)
+            try:
+                data = self._persist_dict.read_json(nametag)
+            except KeyError:
+                # Registration still failed, and registration printed error message already.
+                return
         region = RiotAPIRegion(data["region"])
         assert isinstance(data["puuid"], str)
         puuid = data["puuid"]
         await self.rank_puuid(ctx, region, puuid)
 
-    def _store_puuid(self, nametag: str, region: RiotAPIRegion, puuid: str) -> None:
-        self._persist_dict.store_json(nametag, dict(region=region, puuid=puuid))
+    async def _store_puuid(
+        self, nametag: str, region: RiotAPIRegion, puuid: str
+    ) -> None:
+        await self._persist_dict.store_json_async(
+            nametag, dict(region=region, puuid=puuid)
+        )
 
     @valo.command(hidden=True)
     async def register_puuid(
         self, ctx: Context, nametag: str, region: RiotAPIRegion, puuid: str
     ) -> None:
-        self._store_puuid(nametag, region, puuid)
+        await self._store_puuid(nametag, region, puuid)
         await ctx.message.add_reaction("\N{OK HAND SIGN}")
 
     @valo.command()
@@ -204,13 +229,15 @@ Updated (UTC): {match_start_time.strftime('%c')}"""
                 await ctx.reply(f"Invalid nametag: `{exc}`")
                 return
             try:
+                # Always re-resolves, so this can be used to fix a stale
+                # registration; rank reads existing registrations first
                 region, puuid = await self._henrik3_client.get_puuid(name, tag)
             except Henrik3APIError as exc:
                 if exc.code == 429:
                     await ctx.reply(
                         f"""Exceeded rate limit to get PUUID. Please take these steps instead:
-1. Copy `puuid` field from: {self._henrik3_client.get_account_url(name, tag)}
-2. Run the following command (replacing `PUUID_HERE`): `{ctx.prefix}{self.register_puuid.qualified_name} {nametag} {region.value} PUUID_HERE`"""
+1. Copy `region` and `puuid` fields from: {self._henrik3_client.get_account_url(name, tag)}
+2. Run the following command (replacing `REGION_HERE` and `PUUID_HERE`): `{ctx.prefix}{self.register_puuid.qualified_name} {nametag} REGION_HERE PUUID_HERE`"""
                     )
                     return
                 raise exc
@@ -220,7 +247,9 @@ Updated (UTC): {match_start_time.strftime('%c')}"""
     async def register_creds(
         self, ctx: Context, region: RiotAPIRegion, username: str, password: str
     ) -> None:
-        riot_client = RiotAPIClient(region, username, password)
+        riot_client = RiotAPIClient(
+            region, username, password, self._connector, cache_tokens=False
+        )
         name, tag = await riot_client.get_nametag()
         puuid = await riot_client.get_puuid()
         nametag = _join_nametag(name, tag)
@@ -1,42 +1,178 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import functools
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, cast
+from typing import Any, Dict, Iterable, Optional, Tuple, Union, cast
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 DATA_DIR = Path(__file__).parent / "data"
 
 _PERSIST_STORAGE_DIR = Path(__file__).parent.parent / "runtime"
 
 
+@functools.lru_cache(maxsize=1)
+def get_rank_names() -> Tuple[str, ...]:
+    """Returns Valorant rank names, indexed by competitive tier."""
+    ranks = cast(
+        Dict[str, str],
+        json.loads((DATA_DIR / "valorant" / "ranks.json").read_bytes())["Ranks"],
+    )
+    # Tiers are contiguous from 0, so index rank names by tier directly
+    return tuple(ranks[str(tier)] for tier in range(max(map(int, ranks)) + 1))
+
+
+def load_json(data: Union[str, bytes]) -> Any:
+    """Deserializes JSON, using orjson if installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_json(data: Any) -> bytes:
+    """Serializes data to compact UTF-8 JSON, using orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("UTF-8")
+
+
+def dump_json_pretty(data: Any) -> bytes:
+    """Serializes data to indented UTF-8 JSON, using orjson if installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode("UTF-8")
+
+
 class PersistDictStorage:
+    # Stored as an append-only log with one JSON line per write, where a line
+    # without a value deletes its key. The log is replayed on load, and
+    # compacted once it has more than twice as many lines as there are keys.
+
     def __init__(self, name: str):
         self.name = name.lower()
-        self._filepath: Path = _PERSIST_STORAGE_DIR / f"{self.name}.json"
-        self._cache: Dict[str, Any] = dict()
+        self._filepath: Path = _PERSIST_STORAGE_DIR / f"{self.name}.jsonl"
+        # Loaded on first use, so unused storages cost nothing at startup
+        self._loaded_cache: Optional[Dict[str, Any]] = None
+        # Loading may be triggered from both the event loop and writer threads
+        self._load_lock = threading.Lock()
+        self._log_length = 0
+        # A single writer thread keeps appends in the same order as the writes.
+        # The executor only starts its thread on the first submitted job.
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def _cache(self) -> Dict[str, Any]:
+        if self._loaded_cache is None:
+            with self._load_lock:
+                if self._loaded_cache is None:
+                    self._load()
+            assert self._loaded_cache is not None, "cache is loaded"
+        return self._loaded_cache
 
+    def _load(self) -> None:
+        # Every write loads first, so the directory exists before any write
+        self._filepath.parent.mkdir(exist_ok=True)
+        cache: Dict[str, Any] = dict()
+        log_length = 0
+        needs_compact = False
         if self._filepath.exists():
-            self._cache = json.loads(self._filepath.read_text())
+            with self._filepath.open("rb") as fp:
+                for line in fp:
+                    if not line.endswith(b"\n"):
+                        # Incomplete write at the end of the log
+                        needs_compact = True
+                        break
+                    entry = load_json(line)
+                    if "v" in entry:
+                        cache[entry["k"]] = entry["v"]
+                    else:
+                        cache.pop(entry["k"], None)
+                    log_length += 1
         else:
-            _PERSIST_STORAGE_DIR.mkdir(exist_ok=True)
+            legacy_filepath = self._filepath.with_suffix(".json")
+            if legacy_filepath.exists():
+                # Migrate from the old format, a single JSON object rewritten per write
+                cache = load_json(legacy_filepath.read_bytes())
+                needs_compact = True
+        self._log_length = log_length
+        self._loaded_cache = cache
+        if needs_compact:
+            self._compact()
+
+    async def load_async(self) -> None:
+        """Loads the storage without blocking the event loop."""
+        await asyncio.get_running_loop().run_in_executor(
+            self._writer, lambda: self._cache
+        )
 
-    def _flush_cache(self) -> None:
-        text = json.dumps(self._cache)
-        self._filepath.write_text(text)
+    @staticmethod
+    def _dump_entry(key: str, value: Any) -> bytes:
+        return dump_json(dict(k=key, v=value)) + b"\n"
+
+    def _append(self, key: str, value: Any) -> None:
+        self._append_line(self._dump_entry(key, value))
+
+    def _append_delete(self, key: str) -> None:
+        self._append_line(dump_json(dict(k=key)) + b"\n")
+
+    def _append_line(self, line: bytes) -> None:
+        with self._filepath.open("ab") as fp:
+            fp.write(line)
+        self._log_length += 1
+        if self._log_length > 2 * len(self._cache):
+            self._compact()
+
+    def _compact(self) -> None:
+        entries = tuple(self._cache.items())
+        tmp_filepath = self._filepath.with_suffix(".jsonl.tmp")
+        with tmp_filepath.open("wb") as fp:
+            fp.writelines(self._dump_entry(key, value) for key, value in entries)
+        tmp_filepath.replace(self._filepath)
+        self._log_length = len(entries)
+
+    def compact(self) -> None:
+        self._writer.submit(self._compact).result()
+
+    def _store(self, key: str, value: Any) -> None:
+        self._cache[key] = value
+        self._writer.submit(self._append, key, value).result()
 
     def read_str(self, key: str) -> str:
         return cast(str, self._cache[key])
 
     def store_str(self, key: str, value: str) -> None:
-        self._cache[key] = value
-        self._flush_cache()
+        self._store(key, value)
 
     def read_json(self, key: str) -> Dict[str, Any]:
         return cast(Dict[str, Any], self._cache[key])
 
     def store_json(self, key: str, value: Dict[str, Any]) -> None:
+        self._store(key, value)
+
+    async def store_json_async(self, key: str, value: Dict[str, Any]) -> None:
         self._cache[key] = value
-        self._flush_cache()
+        await asyncio.get_running_loop().run_in_executor(
+            self._writer, self._append, key, value
+        )
+
+    async def delete_async(self, key: str) -> None:
+        # Callers may race to delete the same key, so a missing key is a no-op
+        if key not in self._cache:
+            return
+        del self._cache[key]
+        await asyncio.get_running_loop().run_in_executor(
+            self._writer, self._append_delete, key
+        )
 
     def keys(self) -> Iterable[str]:
         return self._cache.keys()
+
+    def items_json(self) -> Iterable[Tuple[str, Dict[str, Any]]]:
+        return cast(Iterable[Tuple[str, Dict[str, Any]]], self._cache.items())
@@ -56,6 +56,8 @@ def setup_logging() -> Generator[None, None, None]:
 
 
 def main() -> None:
+    # Must happen before Elboto is constructed, since the bot binds to the
+    # current event loop in its constructor
     uvloop.install()
 
     bot = Elboto(cast(BotConfig, config))
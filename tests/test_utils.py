@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from elboto import utils
+from elboto.utils import PersistDictStorage
+
+
+@pytest.fixture(autouse=True)
+def storage_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(utils, "_PERSIST_STORAGE_DIR", tmp_path)
+    return tmp_path
+
+
+def _read_log(storage_dir: Path, name: str) -> List[dict]:
+    with (storage_dir / f"{name}.jsonl").open() as fp:
+        return [json.loads(line) for line in fp]
+
+
+def test_legacy_migration(storage_dir: Path) -> None:
+    (storage_dir / "test.json").write_text(
+        json.dumps({"a": {"x": 1}, "b": "text"})
+    )
+
+    storage = PersistDictStorage("test")
+    assert storage.read_json("a") == {"x": 1}
+    assert storage.read_str("b") == "text"
+    assert _read_log(storage_dir, "test") == [
+        {"k": "a", "v": {"x": 1}},
+        {"k": "b", "v": "text"},
+    ]
+
+    storage.store_json("c", {"y": 2})
+    reloaded = PersistDictStorage("test")
+    assert dict(reloaded.items_json()) == {"a": {"x": 1}, "b": "text", "c": {"y": 2}}
+
+
+def test_truncated_log_replay(storage_dir: Path) -> None:
+    storage = PersistDictStorage("test")
+    storage.store_json("a", {"x": 1})
+    storage.store_json("b", {"x": 2})
+    with (storage_dir / "test.jsonl").open("ab") as fp:
+        fp.write(b'{"k": "c", "v":')
+
+    reloaded = PersistDictStorage("test")
+    assert dict(reloaded.items_json()) == {"a": {"x": 1}, "b": {"x": 2}}
+    # The partial line is dropped, so new writes are not appended onto it
+    reloaded.store_json("c", {"x": 3})
+    assert dict(PersistDictStorage("test").items_json()) == {
+        "a": {"x": 1},
+        "b": {"x": 2},
+        "c": {"x": 3},
+    }
+
+
+def test_compaction(storage_dir: Path) -> None:
+    storage = PersistDictStorage("test")
+    storage.store_json("a", {"x": 1})
+    storage.store_json("a", {"x": 2})
+    assert len(_read_log(storage_dir, "test")) == 2
+
+    # Exceeds twice the number of keys
+    storage.store_json("a", {"x": 3})
+    assert _read_log(storage_dir, "test") == [{"k": "a", "v": {"x": 3}}]
+    assert not (storage_dir / "test.jsonl.tmp").exists()
+    assert PersistDictStorage("test").read_json("a") == {"x": 3}
+
+
+def test_store_json_async_ordering(storage_dir: Path) -> None:
+    storage = PersistDictStorage("test")
+
+    async def store_all() -> None:
+        await asyncio.gather(
+            *(storage.store_json_async("a", {"x": i}) for i in range(50)),
+            *(storage.store_json_async(f"k{i}", {"x": i}) for i in range(10)),
+        )
+
+    asyncio.run(store_all())
+    assert storage.read_json("a") == {"x": 49}
+
+    reloaded = PersistDictStorage("test")
+    assert reloaded.read_json("a") == {"x": 49}
+    assert all(reloaded.read_json(f"k{i}") == {"x": i} for i in range(10))
+
+
+def test_concurrent_load(storage_dir: Path) -> None:
+    (storage_dir / "test.jsonl").write_text(
+        "".join(json.dumps({"k": f"k{i}", "v": {"x": i}}) + "\n" for i in range(100))
+    )
+    storage = PersistDictStorage("test")
+
+    async def load_both() -> None:
+        # Warm up on the writer thread while also reading on the event loop
+        load = asyncio.ensure_future(storage.load_async())
+        await asyncio.sleep(0)
+        assert storage.read_json("k0") == {"x": 0}
+        await load
+
+    asyncio.run(load_both())
+    assert len(_read_log(storage_dir, "test")) == 100
+
+    # Had the log length been counted twice, this would trigger a compaction
+    storage.store_json("k0", {"x": -1})
+    assert len(_read_log(storage_dir, "test")) == 101
+
+
+def test_delete(storage_dir: Path) -> None:
+    storage = PersistDictStorage("test")
+    storage.store_json("a", {"x": 1})
+    storage.store_json("b", {"x": 2})
+    asyncio.run(storage.delete_async("a"))
+    assert list(storage.keys()) == ["b"]
+
+    reloaded = PersistDictStorage("test")
+    assert list(reloaded.keys()) == ["b"]
+    with pytest.raises(KeyError):
+        reloaded.read_json("a")
+
+    # Compaction drops the deleted key entirely
+    reloaded.compact()
+    assert _read_log(storage_dir, "test") == [{"k": "b", "v": {"x": 2}}]
+
+
+def test_lazy_directory(storage_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(utils, "_PERSIST_STORAGE_DIR", storage_dir / "runtime")
+    storage = PersistDictStorage("test")
+    assert not (storage_dir / "runtime").exists()
+    storage.store_str("a", "text")
+    assert PersistDictStorage("test").read_str("a") == "text"
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Dict, List
+
+import pytest
+
+from elboto import utils
+from elboto.cogs.utils import valorant_api
+from elboto.cogs.utils.valorant_api import RiotAPIClient, RiotAPIRegion
+from elboto.utils import PersistDictStorage
+
+
+@pytest.fixture(autouse=True)
+def token_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> PersistDictStorage:
+    monkeypatch.setattr(utils, "_PERSIST_STORAGE_DIR", tmp_path)
+    storage = PersistDictStorage("valorant_tokens")
+    monkeypatch.setattr(valorant_api, "_TOKEN_CACHE", storage)
+    return storage
+
+
+def _store_tokens(client: RiotAPIClient) -> Awaitable[None]:
+    client._access_token = "access"
+    client._id_token = "id"
+    client._entitlements_token = "entitlements"
+    client._expires = time.monotonic() + 3600
+    return client._store_cached_tokens()
+
+
+def test_cached_tokens_require_password(token_cache: PersistDictStorage) -> None:
+    async def run() -> List[bool]:
+        client = RiotAPIClient(RiotAPIRegion.NA, "user", "hunter2")
+        wrong = RiotAPIClient(RiotAPIRegion.NA, "user", "wrong")
+        right = RiotAPIClient(RiotAPIRegion.NA, "user", "hunter2")
+        uncached = RiotAPIClient(RiotAPIRegion.NA, "user", "hunter2", cache_tokens=False)
+        try:
+            await _store_tokens(client)
+            return [
+                await wrong._load_cached_tokens(),
+                await right._load_cached_tokens(),
+                await uncached._load_cached_tokens(),
+            ]
+        finally:
+            for x in (client, wrong, right, uncached):
+                await x.unload()
+
+    assert asyncio.run(run()) == [False, True, False]
+    assert "hunter2" not in token_cache._filepath.read_text()
+
+
+def test_concurrent_expired_sweep(token_cache: PersistDictStorage) -> None:
+    for key in "abc":
+        token_cache.store_json(key, dict(expires=time.time() - 1))
+
+    async def run() -> List[bool]:
+        na = RiotAPIClient(RiotAPIRegion.NA, "user", "hunter2")
+        eu = RiotAPIClient(RiotAPIRegion.EU, "user", "hunter2")
+        try:
+            return list(
+                await asyncio.gather(na._load_cached_tokens(), eu._load_cached_tokens())
+            )
+        finally:
+            await na.unload()
+            await eu.unload()
+
+    assert asyncio.run(run()) == [False, False]
+    assert not list(token_cache.keys())
+    assert not list(PersistDictStorage("valorant_tokens").keys())
+
+
+def test_compet_stats_stop_at_first_hit(monkeypatch: pytest.MonkeyPatch) -> None:
+    puuid = "puuid"
+    rated_match = dict(
+        TierAfterUpdate=12,
+        TierBeforeUpdate=12,
+        RankedRatingAfterUpdate=50,
+        RankedRatingBeforeUpdate=30,
+        MatchStartTime=0,
+    )
+    unrated_match = dict(
+        rated_match,
+        TierAfterUpdate=0,
+        TierBeforeUpdate=0,
+        RankedRatingAfterUpdate=0,
+        RankedRatingBeforeUpdate=0,
+    )
+
+    async def get_mmr(
+        self: RiotAPIClient, puuid: str, start_index: int, end_index: int
+    ) -> Dict[str, Any]:
+        if start_index == 0:
+            return dict(Subject=puuid, Matches=[unrated_match])
+        if start_index == 5:
+            await asyncio.sleep(0.01)
+            return dict(Subject=puuid, Matches=[rated_match])
+        # Older windows never finish, so waiting on them would time out
+        await asyncio.Event().wait()
+        raise AssertionError("unreachable")
+
+    async def refresh_tokens(self: RiotAPIClient, force: bool = False) -> None:
+        pass
+
+    monkeypatch.setattr(RiotAPIClient, "get_mmr", get_mmr)
+    monkeypatch.setattr(RiotAPIClient, "refresh_tokens", refresh_tokens)
+
+    async def run() -> Any:
+        client = RiotAPIClient(RiotAPIRegion.NA, "user", "hunter2")
+        try:
+            return await asyncio.wait_for(client._get_current_compet_stats(puuid), 1)
+        finally:
+            await client.unload()
+
+    stats = asyncio.run(run())
+    assert stats is not None and stats[:2] == (12, 50)